@@ -1,9 +1,14 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
-import plotly.graph_objects as go
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from chatbot import TSLChatbot
+from chatbot import TSLChatbot, normalize_question, read_data
+from data_processor import calculate_bands
+from charts import CHART_COLUMNS, CHART_LAYOUT, create_candlestick_chart, create_candlestick_animation
 
 # Set page config
 st.set_page_config(
@@ -15,163 +20,206 @@ st.set_page_config(
 # Load environment variables
 load_dotenv()
 
-# Initialize session state
-if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
-
-# Initialize the chatbot (cached)
-@st.cache_resource
-def get_chatbot():
+# Load the data (cached); every caller gets its own copy, tagged with when it was loaded
+@st.cache_data(ttl="1h")
+def load_df():
+    df = read_data()
+    df.attrs['loaded_at'] = time.time()
+    return df
+
+# Initialize the chatbot (cached); a new one is built whenever load_df reloads
+# the data, so model answers never lag behind the chart and quick answers
+@st.cache_resource(max_entries=1)
+def get_chatbot(_df, loaded_at):
     api_key_status = "SET" if os.getenv("GEMINI_API_KEY") else "NOT SET"
     print(f"DEBUG: GEMINI_API_KEY status inside get_chatbot: {api_key_status}")
     print(f"DEBUG: GEMINI_API_KEY starts with: {str(os.getenv('GEMINI_API_KEY'))[:5]}...")
-    return TSLChatbot()
-
-def create_candlestick_chart(df):
-    """Create a static candlestick chart with markers and bands"""
-    fig = go.Figure()
-
-    # Add candlestick chart
-    fig.add_trace(go.Candlestick(
-        x=df['timestamp'],
-        open=df['open'],
-        high=df['high'],
-        low=df['low'],
-        close=df['close'],
-        name='TSLA'
-    ))
-
-    # Add support bands
-    for idx, row in df.iterrows():
-        if isinstance(row['Support'], list) and len(row['Support']) > 0:
-            support_lower = min(row['Support'])
-            support_upper = max(row['Support'])
-            fig.add_trace(go.Scatter(
-                x=[row['timestamp'], row['timestamp']],
-                y=[support_lower, support_upper],
-                fill='tonexty',
-                mode='lines',
-                line_color='green',
-                name='Support Band',
-                opacity=0.3,
-                showlegend=False
-            ))
-
-    # Add resistance bands
-    for idx, row in df.iterrows():
-        if isinstance(row['Resistance'], list) and len(row['Resistance']) > 0:
-            resistance_lower = min(row['Resistance'])
-            resistance_upper = max(row['Resistance'])
-            fig.add_trace(go.Scatter(
-                x=[row['timestamp'], row['timestamp']],
-                y=[resistance_lower, resistance_upper],
-                fill='tonexty',
-                mode='lines',
-                line_color='red',
-                name='Resistance Band',
-                opacity=0.3,
-                showlegend=False
-            ))
-
-    # Add direction markers
-    for idx, row in df.iterrows():
-        if row['direction'] == 'LONG':
-            fig.add_trace(go.Scatter(
-                x=[row['timestamp']],
-                y=[row['low'] * 0.99],
-                mode='markers',
-                marker=dict(symbol='triangle-up', size=15, color='green'),
-                name='LONG',
-                showlegend=False
-            ))
-        elif row['direction'] == 'SHORT':
-            fig.add_trace(go.Scatter(
-                x=[row['timestamp']],
-                y=[row['high'] * 1.01],
-                mode='markers',
-                marker=dict(symbol='triangle-down', size=15, color='red'),
-                name='SHORT',
-                showlegend=False
-            ))
+    return TSLChatbot(_df)
+
+@st.cache_data(ttl="1h")
+def load_chart_data():
+    """Load the chart data with band bounds precomputed as float columns"""
+    # Keep only what the chart reads; the list-valued Support/Resistance and
+    # volume columns would otherwise be copied out of the cache on every rerun.
+    # Prices and band bounds are already float32 and direction categorical.
+    return calculate_bands(load_df())[CHART_COLUMNS]
+
+# Cheap DataFrame fingerprint for the chart caches
+DF_HASH_FUNCS = {pd.DataFrame: lambda d: (len(d), str(d['timestamp'].iloc[-1]))}
+
+@st.cache_data(ttl="1h", max_entries=4, hash_funcs=DF_HASH_FUNCS)
+def build_chart(df):
+    """Build the chart once per dataset instead of on every rerun"""
+    return create_candlestick_chart(df)
+
+@st.cache_data(ttl="1h", max_entries=4, hash_funcs=DF_HASH_FUNCS)
+def build_replay_html(df):
+    """Render the replay to HTML once per dataset; Plotly.js then plays it in the browser"""
+    fig = create_candlestick_animation(df)
+    return fig.to_html(include_plotlyjs='cdn', full_html=False, auto_play=True)
+
+# Questions answered straight from the data instead of going through the LLM;
+# each must match the whole question, so one that names another period or
+# adds a condition still goes to the model
+QUICK_QUESTIONS = {
+    'highest_price': re.compile(r'(what was the )?highest price( in the dataset)?'),
+    'average_volume': re.compile(r'(what was the )?average (trading )?volume'),
+    'last_30_days': re.compile(r'(show me the )?price trend over the last 30 days'),
+}
+
+@st.cache_data(max_entries=1)
+def get_quick_answers(_df, loaded_at):
+    """Precompute the answers to the QUICK_QUESTIONS once per loaded dataset"""
+    # The frame itself isn't hashed; loaded_at identifies it
+    df = _df
+    highest = df.loc[df['high'].idxmax()]
+    recent = df[df['timestamp'] >= df['timestamp'].iloc[-1] - pd.Timedelta(days=30)]
+    first_close, last_close = recent['close'].iloc[0], recent['close'].iloc[-1]
+    change = (last_close - first_close) / first_close * 100
+    return {
+        'highest_price': (
+            f"The highest price in the dataset was {highest['high']:.2f}, "
+            f"reached on {highest['timestamp']:%Y-%m-%d}."
+        ),
+        'average_volume': f"The average trading volume was {df['volume'].mean():,.2f}.",
+        'last_30_days': (
+            f"Over the last 30 days ({recent['timestamp'].iloc[0]:%Y-%m-%d} to "
+            f"{recent['timestamp'].iloc[-1]:%Y-%m-%d}) the close moved from {first_close:.2f} "
+            f"to {last_close:.2f} ({change:+.2f}%), trading between "
+            f"{recent['low'].min():.2f} and {recent['high'].max():.2f}."
+        ),
+    }
+
+def quick_answer(question, df):
+    """Answer from the precomputed stats of df, or None if the question needs the model"""
+    # Normalized like the chatbot's answer cache keys
+    question = normalize_question(question)
+    for key, pattern in QUICK_QUESTIONS.items():
+        if pattern.fullmatch(question):
+            return get_quick_answers(df, df.attrs['loaded_at'])[key]
+    return None
+
+# Worker threads for model calls, shared by all sessions (cached)
+@st.cache_resource
+def get_executor():
+    return ThreadPoolExecutor(max_workers=4)
+
+def ask(chatbot, question):
+    """Record a question and answer it, in the background if it needs the model
+
+    Runs as a widget callback, so the inputs already render disabled on the
+    rerun that follows. A question asked while another is still being answered
+    is ignored rather than orphaning the pending answer.
+    """
+    if not question or 'pending_response' in st.session_state:
+        return
+    st.session_state.chat_history.append({"role": "user", "content": question})
+    # From the chatbot's own data, so both paths agree
+    response = quick_answer(question, chatbot.df)
+    if response is None:
+        st.session_state.pending_response = get_executor().submit(chatbot.generate_response, question)
+    else:
+        st.session_state.chat_history.append({"role": "assistant", "content": response})
+
+@st.fragment(run_every=1)
+def pending_response():
+    """Poll the background model call and post its answer once it is done"""
+    future = st.session_state.pending_response
+    if not future.done():
+        st.info("Analyzing...")
+        return
+    st.session_state.chat_history.append({"role": "assistant", "content": future.result()})
+    del st.session_state.pending_response
+    st.rerun()
+
+@st.fragment
+def chat_fragment(chatbot):
+    """Chat tab; its interactions rerun only this fragment, not the chart"""
+    st.subheader("AI Assistant")
+    # One question at a time; inputs are disabled while the model is answering
+    busy = 'pending_response' in st.session_state
+
+    example_questions = [
+        "What was the highest price in the dataset?",
+        "Show me the trading patterns for the last month",
+        "What were the most common support levels?",
+        "Analyze the volume trends",
+        "What was the average trading volume?",
+        "Show me the price trend over the last 30 days"
+    ]
+
+    st.subheader("Example Questions")
+    cols = st.columns(3)
+    for i, question in enumerate(example_questions):
+        cols[i % 3].button(
+            question, key=f"btn_{i}", disabled=busy,
+            on_click=ask, args=(chatbot, question)
+        )
+
+    st.subheader("Chat with the Bot")
+    # One markdown element for the whole history instead of one per message
+    if st.session_state.chat_history:
+        st.markdown("\n\n".join(
+            f"👤 You: {message['content']}" if message["role"] == "user"
+            else f"🤖 Bot: {message['content']}"
+            for message in st.session_state.chat_history
+        ))
+
+    # A clearing form submits each question once, so no explicit rerun is needed
+    with st.form("chat_form", clear_on_submit=True):
+        st.text_input("Ask a question about TSLA stock data:", key="user_input")
+        st.form_submit_button(
+            "Ask", disabled=busy,
+            on_click=lambda: ask(chatbot, st.session_state.user_input)
+        )
+
+    if 'pending_response' in st.session_state:
+        pending_response()
+
+def init_state():
+    """Initialize session state on a session's first run"""
+    if 'chat_history' not in st.session_state:
+        st.session_state.chat_history = []
+
+def chart_view():
+    """Chart tab: the static chart or the animated replay"""
+    st.subheader("Interactive Chart")
+    try:
+        df = load_chart_data()
+
+        if df is None or df.empty:
+            st.error("Error: No stock data available.")
         else:
-            fig.add_trace(go.Scatter(
-                x=[row['timestamp']],
-                y=[row['close']],
-                mode='markers',
-                marker=dict(symbol='circle', size=10, color='yellow'),
-                name='None',
-                showlegend=False
-            ))
-
-    # Update layout
-    fig.update_layout(
-        title='TSLA Stock Price with Support/Resistance Bands',
-        yaxis_title='Price',
-        xaxis_title='Date',
-        template='plotly_dark',
-        showlegend=True,
-        height=800,
-        xaxis=dict(rangeslider=dict(visible=True), type="date")
-    )
+            if st.toggle("Animated replay", key="animate_chart"):
+                # Embedded as HTML so the frames skip st.plotly_chart's per-rerun
+                # validation and serialization
+                components.html(build_replay_html(df), height=CHART_LAYOUT['height'] + 20)
+            else:
+                st.plotly_chart(build_chart(df), use_container_width=True, theme=None)
 
-    return fig
+    except Exception as e:
+        st.error(f"Error loading data: {str(e)}")
+        import traceback
+        st.error(traceback.format_exc())
 
 def main():
+    init_state()
     st.title("📈 TSLA Stock Analysis Dashboard")
     
-    tab1, tab2 = st.tabs(["Chart Analysis", "AI Assistant"])
-    
-    with tab1:
-        st.subheader("Interactive Chart")
-        try:
-            chatbot = get_chatbot()
-            df = chatbot.df
-
-            if df is None or df.empty:
-                st.error("Error: No stock data available.")
-            else:
-                fig = create_candlestick_chart(df)
-                st.plotly_chart(fig, use_container_width=True)
-
-        except Exception as e:
-            st.error(f"Error loading data: {str(e)}")
-            import traceback
-            st.error(traceback.format_exc())
+    # Unlike st.tabs, only the selected view's code runs on each rerun
+    view = st.radio(
+        "View",
+        ["Chart Analysis", "AI Assistant"],
+        horizontal=True,
+        key="active_tab",
+        label_visibility="collapsed"
+    )
     
-    with tab2:
-        st.subheader("AI Assistant")
-
-        example_questions = [
-            "What was the highest price in the dataset?",
-            "Show me the trading patterns for the last month",
-            "What were the most common support levels?",
-            "Analyze the volume trends",
-            "What was the average trading volume?",
-            "Show me the price trend over the last 30 days"
-        ]
-
-        st.subheader("Example Questions")
-        cols = st.columns(3)
-        for i, question in enumerate(example_questions):
-            if cols[i % 3].button(question, key=f"btn_{i}"):
-                st.session_state.chat_history.append({"role": "user", "content": question})
-                response = chatbot.generate_response(question)
-                st.session_state.chat_history.append({"role": "assistant", "content": response})
-
-        st.subheader("Chat with the Bot")
-        for message in st.session_state.chat_history:
-            if message["role"] == "user":
-                st.write(f"👤 You: {message['content']}")
-            else:
-                st.write(f"🤖 Bot: {message['content']}")
-
-        user_query = st.text_input("Ask a question about TSLA stock data:", key="user_input")
-        if user_query:
-            st.session_state.chat_history.append({"role": "user", "content": user_query})
-            with st.spinner("Analyzing..."):
-                response = chatbot.generate_response(user_query)
-                st.session_state.chat_history.append({"role": "assistant", "content": response})
-            st.rerun()
+    if view == "Chart Analysis":
+        chart_view()
+    else:
+        df = load_df()
+        chat_fragment(get_chatbot(df, df.attrs['loaded_at']))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,201 @@
+import numpy as np
+import plotly.graph_objects as go
+from data_processor import MARKER_STYLES, direction_styles
+
+# Columns the chart reads: timestamp, float price and band columns, direction
+CHART_COLUMNS = [
+    'timestamp', 'open', 'high', 'low', 'close',
+    'Support_Lower', 'Support_Upper', 'Resistance_Lower', 'Resistance_Upper',
+    'direction'
+]
+
+# Discrete colorscale mapping a MARKER_STYLES index to its color
+MARKER_COLORSCALE = [
+    [i / (len(MARKER_STYLES) - 1), color]
+    for i, (_, _, _, color) in enumerate(MARKER_STYLES)
+]
+
+def compact_rows(mask, *columns):
+    """Keep the rows where mask is set, plus how many were kept before each row"""
+    counts = np.concatenate([[0], np.cumsum(mask)])
+    return (counts,) + tuple(column[mask] for column in columns)
+
+def downsample(df, max_bars=2000):
+    """Merge runs of consecutive rows so at most max_bars candles are drawn
+
+    Each bucket keeps its OHLC extremes (first open, highest high, lowest low,
+    last close), the outer band bounds and its last trading signal.
+    """
+    if len(df) <= max_bars:
+        return df
+    buckets = np.arange(len(df)) * max_bars // len(df)
+    return df.groupby(buckets).agg(
+        timestamp=('timestamp', 'first'),
+        open=('open', 'first'),
+        high=('high', 'max'),
+        low=('low', 'min'),
+        close=('close', 'last'),
+        Support_Lower=('Support_Lower', 'min'),
+        Support_Upper=('Support_Upper', 'max'),
+        Resistance_Lower=('Resistance_Lower', 'min'),
+        Resistance_Upper=('Resistance_Upper', 'max'),
+        direction=('direction', 'last'),
+    )
+
+def get_chart_arrays(df):
+    """Extract everything the chart draws as NumPy arrays, once per dataset"""
+    arrays = {
+        column: df[column].to_numpy()
+        for column in ('open', 'high', 'low', 'close')
+    }
+    # Epoch milliseconds, which a date axis reads as dates; serializing plain
+    # integers in every frame is cheaper and shorter than ISO date strings
+    arrays['timestamp'] = df['timestamp'].to_numpy().astype('datetime64[ms]').astype('int64')
+
+    # Support and resistance band bounds, compacted to the rows that have levels
+    # so a replay frame only needs a prefix slice instead of a NaN mask
+    for column in ('Support', 'Resistance'):
+        lower = df[f'{column}_Lower'].to_numpy()
+        upper = df[f'{column}_Upper'].to_numpy()
+        arrays[column] = compact_rows(~np.isnan(lower), arrays['timestamp'], upper, lower)
+
+    # One marker per row, below/above the candle and styled by direction
+    style = direction_styles(df['direction'])
+    arrays['marker_y'] = np.choose(style, [
+        arrays['low'] * 0.99,
+        arrays['high'] * 1.01,
+        arrays['close'],
+    ])
+    for key, values in zip(('name', 'symbol', 'size'), zip(*MARKER_STYLES)):
+        arrays[f'marker_{key}'] = np.array(values)[style]
+    # Colors go out as style indexes into MARKER_COLORSCALE; Plotly validates
+    # numbers far faster than per-point color strings
+    arrays['marker_color'] = style
+
+    return arrays
+
+def get_chart_traces(arrays, end=None, begin=0):
+    """Build the candlestick, band and marker traces for rows begin..end as plain dicts"""
+    timestamps = arrays['timestamp'][begin:end]
+
+    # Add candlestick chart
+    traces = [dict(
+        type='candlestick',
+        x=timestamps,
+        open=arrays['open'][begin:end],
+        high=arrays['high'][begin:end],
+        low=arrays['low'][begin:end],
+        close=arrays['close'][begin:end],
+        name='TSLA'
+    )]
+
+    # Add support and resistance bands, one filled polygon per band
+    for column, color in (('Support', 'green'), ('Resistance', 'red')):
+        counts, x, upper, lower = arrays[column]
+        first, last = counts[begin], counts[-1 if end is None else end]
+        x, upper, lower = x[first:last], upper[first:last], lower[first:last]
+        traces.append(dict(
+            type='scatter',
+            x=np.concatenate([x, x[::-1]]),
+            y=np.concatenate([upper, lower[::-1]]),
+            fill='toself',
+            mode='lines',
+            line_color=color,
+            name=f'{column} Band',
+            opacity=0.3,
+            showlegend=False
+        ))
+
+    # Add direction markers as a single trace with per-point styles
+    traces.append(dict(
+        type='scatter',
+        x=timestamps,
+        y=arrays['marker_y'][begin:end],
+        text=arrays['marker_name'][begin:end],
+        mode='markers',
+        marker=dict(
+            symbol=arrays['marker_symbol'][begin:end],
+            size=arrays['marker_size'][begin:end],
+            color=arrays['marker_color'][begin:end],
+            colorscale=MARKER_COLORSCALE,
+            cmin=0,
+            cmax=len(MARKER_STYLES) - 1
+        ),
+        name='Direction',
+        showlegend=False
+    ))
+
+    return traces
+
+# Layout shared by the static chart and the replay
+CHART_LAYOUT = dict(
+    title='TSLA Stock Price with Support/Resistance Bands',
+    yaxis_title='Price',
+    xaxis_title='Date',
+    template='plotly_dark',
+    showlegend=True,
+    height=800,
+    xaxis=dict(rangeslider=dict(visible=True), type="date")
+)
+
+def create_candlestick_chart(df, max_bars=2000):
+    """Create a static candlestick chart with markers and bands"""
+    arrays = get_chart_arrays(downsample(df, max_bars))
+    return go.Figure(data=get_chart_traces(arrays), layout=CHART_LAYOUT)
+
+def create_candlestick_animation(df, start=10, frame_duration=100, max_frames=300, window=200):
+    """Create a candlestick chart that replays the data bar by bar
+
+    Long datasets advance several bars per frame so the replay never has more
+    than max_frames frames, and each frame only carries and shows the last
+    `window` bars, so the payload grows linearly rather than quadratically
+    with the number of rows.
+    """
+    start = min(start, len(df))
+
+    # Frames are plain dicts so Plotly only validates them once, on the figure.
+    # Each frame slices the same precomputed arrays rather than re-reading df.
+    arrays = get_chart_arrays(df)
+    timestamps = arrays['timestamp']
+    frame_ends = np.unique(np.linspace(start, len(df), max_frames, dtype=int))
+    frames = []
+    for end in frame_ends:
+        begin = max(0, end - window)
+        frames.append(dict(
+            name=str(end),
+            data=get_chart_traces(arrays, end, begin),
+            layout=dict(xaxis=dict(range=[timestamps[begin], timestamps[end - 1]]))
+        ))
+
+    fig = go.Figure(data=frames[0]['data'], layout=CHART_LAYOUT, frames=frames)
+
+    # Fix the price axis to the full data range while the time axis follows the
+    # frames, and drop the range slider, which would be redrawn on every frame
+    fig.update_layout(
+        xaxis_rangeslider_visible=False,
+        xaxis_range=frames[0]['layout']['xaxis']['range'],
+        yaxis_range=[df['low'].min() * 0.95, df['high'].max() * 1.05],
+        updatemenus=[dict(
+            type='buttons',
+            showactive=False,
+            buttons=[
+                dict(
+                    label='Play',
+                    method='animate',
+                    args=[None, dict(
+                        frame=dict(duration=frame_duration, redraw=True),
+                        transition=dict(duration=0),
+                        fromcurrent=True,
+                        mode='immediate'
+                    )]
+                ),
+                dict(
+                    label='Pause',
+                    method='animate',
+                    args=[[None], dict(frame=dict(duration=0, redraw=False), mode='immediate')]
+                )
+            ]
+        )]
+    )
+
+    return fig
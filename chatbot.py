@@ -1,9 +1,14 @@
-import base64
+import argparse
+import asyncio
 import os
+import re
+import threading
 import time
+import numpy as np
 import pandas as pd
 import google.generativeai as genai
 from dotenv import load_dotenv  # MISSING!
+from data_processor import read_tsla_csv
 
 
 # Set the API key
@@ -14,78 +19,299 @@ api_key = os.getenv("GEMINI_API_KEY")  # NEW
 if not api_key:
     raise ValueError("GEMINI_API_KEY not set in .env or environment!")  # NEW
 genai.configure(api_key=api_key)
+
+# Shared by every chatbot; copy before changing
+SAFETY_SETTINGS = tuple(
+    {"category": category, "threshold": "BLOCK_NONE"}
+    for category in (
+        "HARM_CATEGORY_HARASSMENT",
+        "HARM_CATEGORY_HATE_SPEECH",
+        "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "HARM_CATEGORY_DANGEROUS_CONTENT",
+    )
+)
+
+# Minimum time in seconds between the starts of two model requests
+REQUEST_INTERVAL = 1.0
+
+DATA_FILE = 'TSLA_data - Sheet1.csv'
+# Bump whenever the parsing or dtypes of read_data change, so caches written
+# by older code are ignored
+CACHE_VERSION = 1
+
+def cache_path(file_path):
+    """Parquet cache of a CSV file: next to it, tagged with CACHE_VERSION."""
+    return f"{os.path.splitext(file_path)[0]}.v{CACHE_VERSION}.parquet"
+
+# Parsed copy of DATA_FILE; rebuilt whenever the CSV is newer
+CACHE_FILE = cache_path(DATA_FILE)
+# Questions typed into the command-line chatbot, and how many of them are kept
+HISTORY_FILE = '.tsla_history'
+HISTORY_LENGTH = 1000
+
+def read_cache(cache_file):
+    """Read the Parquet cache, or None if it can't be read."""
+    try:
+        df = pd.read_parquet(cache_file)
+        # Parquet list columns come back as arrays
+        df['Support'] = df['Support'].map(np.ndarray.tolist)
+        df['Resistance'] = df['Resistance'].map(np.ndarray.tolist)
+    except Exception as e:
+        print(f"Ignoring unreadable cache {cache_file}: {str(e)}")
+        return None
+    return df
+
+def write_cache(df, cache_file):
+    """Write the Parquet cache; the cache is optional, so failures are only reported."""
+    # Written next to the cache and then renamed, so a reader never sees a partial file
+    temp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        df.to_parquet(temp_file, index=False)
+        os.replace(temp_file, cache_file)
+    except Exception as e:
+        print(f"Not caching the data to {cache_file}: {str(e)}")
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+def read_data(file_path=DATA_FILE, use_cache=True, rebuild_cache=False):
+    """Read the TSLA data, from the file's Parquet cache when it is up to date."""
+    cache_file = cache_path(file_path) if use_cache else None
+    if (cache_file and not rebuild_cache and os.path.exists(cache_file)
+            and os.path.getmtime(cache_file) >= os.path.getmtime(file_path)):
+        df = read_cache(cache_file)
+        if df is not None:
+            return df
+
+    df = read_tsla_csv(file_path)
+    if cache_file:
+        write_cache(df, cache_file)
+    return df
+
+# Questions that explicitly want every row instead of a summary
+FULL_DATA_PATTERN = re.compile(r'\b(all|entire|full|whole|every)\b.*\b(data|dataset|rows|csv)\b', re.I)
+# "2024-05" or "2024-05-03"
+DATE_PATTERN = re.compile(r'\b\d{4}-\d{2}(?:-\d{2})?\b')
+# "last month", "past 30 days", "previous 2 weeks"
+RECENT_PATTERN = re.compile(r'\b(?:last|past|previous)\s+(\d+\s+)?(day|week|month|year)s?\b', re.I)
+
+# Most answers kept by a chatbot; the oldest is dropped first
+MAX_CACHED_ANSWERS = 512
+
+def normalize_question(user_query):
+    """Case- and spacing-insensitive form of a question, used as its cache key.
+
+    Only a trailing ?, ! or . is dropped; other punctuation, such as < or >,
+    can change what the question asks.
+    """
+    return " ".join(user_query.lower().split()).rstrip("?!.")
+
+def summarize_data(df):
+    """Compact text summary of the data: date range, statistics, monthly OHLCV and common levels."""
+    monthly = df.resample('MS', on='timestamp').agg({
+        'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'
+    }).dropna()
+    directions = df['direction'].astype(object).fillna('None').value_counts()
+    sections = [
+        f"{len(df)} daily rows from {df['timestamp'].iloc[0]:%Y-%m-%d} to {df['timestamp'].iloc[-1]:%Y-%m-%d}.",
+        "Statistics:\n" + df[['open', 'high', 'low', 'close', 'volume']].describe().to_string(float_format='{:.2f}'.format),
+        "Trading directions:\n" + directions.to_string(),
+        "Monthly OHLCV:\n" + monthly.to_string(float_format='{:.2f}'.format),
+    ]
+    for column in ('Support', 'Resistance'):
+        counts = df[column].explode().dropna().value_counts().head(10)
+        sections.append(f"Most common {column.lower()} levels (level, days):\n" + counts.to_string())
+    return "\n\n".join(sections)
+
+def select_rows(df, user_query):
+    """Rows of the period a question names by date or as "last N days", or None if it names none."""
+    timestamps = df['timestamp']
+    periods = []
+    for date in DATE_PATTERN.findall(user_query):
+        try:
+            periods.append(pd.Period(date))
+        except ValueError:
+            # Not a real date, such as 2023-13; the summary still answers
+            continue
+    if periods:
+        start = min(period.start_time for period in periods)
+        end = max(period.end_time for period in periods)
+        return df[(timestamps >= start) & (timestamps <= end)]
+    match = RECENT_PATTERN.search(user_query)
+    if match:
+        offset = pd.DateOffset(**{f"{match.group(2).lower()}s": int(match.group(1) or 1)})
+        return df[timestamps > timestamps.iloc[-1] - offset]
+    return None
+
 class TSLChatbot:
-    def __init__(self):
-        self.df = None
+    def __init__(self, df=None, rebuild_cache=False):
+        # Answers by normalized question and data version, and data summaries by
+        # kind; both are cleared whenever df is replaced
+        self._answers = {}
+        self._answers_lock = threading.Lock()
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+        self._df_version = 0
+        self.df = df
         self.model = genai.GenerativeModel('models/gemini-1.5-flash')
-        self.safety_settings = [
-            {
-                "category": "HARM_CATEGORY_HARASSMENT",
-                "threshold": "BLOCK_NONE"
-            },
-            {
-                "category": "HARM_CATEGORY_HATE_SPEECH",
-                "threshold": "BLOCK_NONE"
-            },
-            {
-                "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                "threshold": "BLOCK_NONE"
-            },
-            {
-                "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                "threshold": "BLOCK_NONE"
-            }
-        ]
-        self.load_data()
-
-    def load_data(self):
+        self.safety_settings = SAFETY_SETTINGS
+        # Start time of the next free request slot, shared by all threads
+        self._next_request_at = 0.0
+        self._request_lock = threading.Lock()
+        if self.df is None:
+            self.load_data(rebuild_cache)
+
+    def load_data(self, rebuild_cache=False):
         """Load and preprocess the TSLA data."""
         try:
-            self.df = pd.read_csv('TSLA_data - Sheet1.csv')
-            # Convert timestamp to datetime
-            self.df['timestamp'] = pd.to_datetime(self.df['timestamp'])
-            # Convert Support and Resistance strings to lists
-            self.df['Support'] = self.df['Support'].apply(eval)
-            self.df['Resistance'] = self.df['Resistance'].apply(eval)
+            self.df = read_data(rebuild_cache=rebuild_cache)
             print("Data loaded successfully!")
         except Exception as e:
             print(f"Error loading data: {str(e)}")
             raise
 
-    def generate_response(self, user_query):
-        """Generate a response based on the user's query."""
-        try:
-            # Convert DataFrame to CSV string
-            csv_str = self.df.to_csv(index=False)
-            
-            # Create the prompt
-            prompt = f"""I have loaded the TSLA stock data. The data includes timestamp, trading direction (SHORT/LONG), support and resistance levels, OHLC prices, and volume. 
-Here is the data in CSV format:
-{csv_str}
+    @property
+    def df(self):
+        """The loaded data."""
+        return self._df
 
-Please analyze this data and answer the following question:
-{user_query}
+    @df.setter
+    def df(self, df):
+        """Replace the data and drop everything cached from the old data."""
+        with self._derived_lock:
+            self._df = df
+            self._df_version += 1
+            self._derived.clear()
+        with self._answers_lock:
+            self._answers.clear()
 
-Please provide a detailed analysis with specific data points from the CSV. Include relevant statistics, trends, and insights."""
+    @property
+    def df_version(self):
+        """Number of times df was set, used to key cached responses."""
+        return self._df_version
 
-            # Add rate limiting
-            time.sleep(1)  # Wait 1 second between requests
-            
-            # Generate response
-            response = self.model.generate_content(
-                prompt,
-                safety_settings=self.safety_settings
-            )
-            return response.text
+    def warm_up(self):
+        """Build the cached data summary before the first question needs it."""
+        self._summary()
+
+    def generate_response(self, user_query):
+        """Generate a response based on the user's query."""
+        try:
+            # Rephrasings that only differ in case or spacing share one cached
+            # answer, but the model always sees the question as it was asked
+            df_version = self.df_version
+            key = (normalize_question(user_query), df_version)
+            with self._answers_lock:
+                answer = self._answers.get(key)
+            if answer is None:
+                answer = self._generate(user_query)
+                with self._answers_lock:
+                    self._answers[key] = answer
+                    if len(self._answers) > MAX_CACHED_ANSWERS:
+                        del self._answers[next(iter(self._answers))]
+            return answer
 
         except Exception as e:
             if "429" in str(e):
                 return "Rate limit exceeded. Please wait a minute before trying again."
             return f"Error: {str(e)}"
 
+    def generate_responses(self, user_queries):
+        """Answer several questions at once; their model calls overlap instead of queueing."""
+        return asyncio.run(self._generate_batch(user_queries))
+
+    async def _generate_batch(self, user_queries):
+        """Run the distinct questions of a batch concurrently."""
+        keys = [normalize_question(user_query) for user_query in user_queries]
+        # First wording of each distinct question
+        unique = {}
+        for key, user_query in zip(keys, user_queries):
+            unique.setdefault(key, user_query)
+        responses = await asyncio.gather(*(
+            asyncio.to_thread(self.generate_response, user_query) for user_query in unique.values()
+        ))
+        answers = dict(zip(unique, responses))
+        return [answers[key] for key in keys]
+
+    def _request_delay(self):
+        """Reserve the next request slot and return how long to wait for it."""
+        with self._request_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_request_at)
+            self._next_request_at = slot + REQUEST_INTERVAL
+        return slot - now
+
+    def _derive(self, kind, compute):
+        """compute(df), computed once per data version and cached as kind."""
+        with self._derived_lock:
+            if kind not in self._derived:
+                self._derived[kind] = compute(self._df)
+            return self._derived[kind]
+
+    def _summary(self):
+        """Summary of the data, computed once per data version."""
+        return self._derive('summary', summarize_data)
+
+    def _csv(self):
+        """The whole data as CSV, serialized once per data version."""
+        return self._derive('csv', lambda df: df.to_csv(index=False))
+
+    def _context(self, user_query):
+        """Data section of the prompt for a question."""
+        if FULL_DATA_PATTERN.search(user_query):
+            return f"Here is the data in CSV format:\n{self._csv()}"
+        context = f"Here is a summary of the data:\n{self._summary()}"
+        rows = select_rows(self.df, user_query)
+        if rows is not None and not rows.empty:
+            context += f"\n\nHere are the rows for the period in question in CSV format:\n{rows.to_csv(index=False)}"
+        return context
+
+    def _generate(self, user_query):
+        """Ask the model; generate_response caches the answers, errors are not cached."""
+        # Send a summary plus only the rows the question refers to, not the whole CSV
+        prompt = f"""I have loaded the TSLA stock data. The data includes timestamp, trading direction (SHORT/LONG), support and resistance levels, OHLC prices, and volume. 
+{self._context(user_query)}
+
+Please analyze this data and answer the following question:
+{user_query}
+
+Please provide a detailed analysis with specific data points from the data above. Include relevant statistics, trends, and insights."""
+
+        # Add rate limiting: requests start at most once per REQUEST_INTERVAL,
+        # but concurrent ones still overlap their network round trips
+        time.sleep(self._request_delay())
+        
+        # Generate response
+        response = self.model.generate_content(
+            prompt,
+            safety_settings=self.safety_settings
+        )
+        return response.text
+
 def main():
+    parser = argparse.ArgumentParser(description="TSLA data chatbot")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help=f"re-parse {DATA_FILE} instead of reading {CACHE_FILE}")
+    args = parser.parse_args()
+    
     print("Initializing TSLA Chatbot...")
-    chatbot = TSLChatbot()
+    chatbot = TSLChatbot(rebuild_cache=args.rebuild_cache)
+    # Prepare the prompt context while the user types the first question
+    threading.Thread(target=chatbot.warm_up, daemon=True).start()
+    
+    # Line editing and history across sessions, where readline is available
+    try:
+        import readline
+    except ImportError:
+        readline = None
+    else:
+        readline.set_history_length(HISTORY_LENGTH)
+        try:
+            if os.path.exists(HISTORY_FILE):
+                readline.read_history_file(HISTORY_FILE)
+        except OSError as e:
+            # Unreadable, or written by another readline library; start afresh
+            print(f"Ignoring history file {HISTORY_FILE}: {str(e)}")
     
     print("\nTSLA Data Chatbot (type 'quit' to exit)")
     print("Ask questions about the TSLA stock data...")
@@ -102,6 +328,12 @@ def main():
             
         response = chatbot.generate_response(user_query)
         print("\nResponse:", response)
+        if readline:
+            try:
+                readline.write_history_file(HISTORY_FILE)
+            except OSError as e:
+                print(f"Not saving history to {HISTORY_FILE}: {str(e)}")
+                readline = None
 
 if __name__ == "__main__":
     main()
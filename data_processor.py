@@ -1,23 +1,108 @@
+import itertools
 import pandas as pd
 import numpy as np
-from typing import List, Tuple
-import ast
+import orjson
+from typing import Iterator, List, Optional, Tuple
 
-def load_tsla_data(file_path: str) -> pd.DataFrame:
+# Trading directions; anything else (no signal) gets category code -1
+DIRECTION_DTYPE = pd.CategoricalDtype(['LONG', 'SHORT'])
+
+# Marker style per trading direction: (name, symbol, size, color), for LONG,
+# SHORT and then rows without a signal, so a direction's category code is
+# also its style index
+MARKER_STYLES = (
+    ('LONG', 'triangle-up', 15, 'green'),
+    ('SHORT', 'triangle-down', 15, 'red'),
+    ('None', 'circle', 10, 'yellow'),
+)
+
+# Column types of the raw CSV, so read_csv skips type inference; volume has
+# fractional values, so it stays a float
+DTYPES = {
+    'direction': DIRECTION_DTYPE,
+    'open': 'float32',
+    'high': 'float32',
+    'low': 'float32',
+    'close': 'float32',
+    'volume': 'float32',
+}
+
+def parse_level_list(cell: str) -> List[float]:
+    """
+    Parse one "[840, 880.5]"-style cell, treating a malformed one as having no levels
+    
+    Args:
+        cell (str): Support or Resistance cell as read from the CSV
+        
+    Returns:
+        List[float]: The cell's levels, or an empty list if it isn't a list of numbers
+    """
+    # The level lists are valid JSON, which orjson parses in C; floats keep
+    # whole-number levels the same type as in the Parquet cache
+    try:
+        return list(map(float, orjson.loads(cell)))
+    except (orjson.JSONDecodeError, TypeError, ValueError):
+        return []
+
+def parse_levels(column: pd.Series) -> pd.Series:
+    """
+    Parse "[840, 880.5]"-style strings into lists of floats without evaluating them
+    
+    Args:
+        column (pd.Series): Support or Resistance column as read from the CSV
+        
+    Returns:
+        pd.Series: Lists of float levels, empty where a row has none or its cell is malformed
+    """
+    return pd.Series([parse_level_list(cell) for cell in column.fillna('[]')], index=column.index)
+
+def parse_level_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parse the Support and Resistance columns of a raw CSV frame into lists
+    
+    Args:
+        df (pd.DataFrame): Dataframe as read from the CSV
+        
+    Returns:
+        pd.DataFrame: The same dataframe with list-valued Support and Resistance columns
+    """
+    df['Support'] = parse_levels(df['Support'])
+    df['Resistance'] = parse_levels(df['Resistance'])
+    return df
+
+def read_tsla_csv(file_path: str, chunksize: Optional[int] = None) -> pd.DataFrame:
+    """
+    Read the TSLA CSV with its column types and list-valued Support and Resistance
+    
+    Args:
+        file_path (str): Path to the CSV file
+        chunksize (Optional[int]): Parse the file this many rows at a time, so only one
+            chunk's raw Support/Resistance strings are in memory at once
+        
+    Returns:
+        pd.DataFrame: The CSV's columns, with parsed timestamps and level lists
+    """
+    if chunksize:
+        # The pyarrow engine can't read in chunks, so this uses the C engine
+        chunks = pd.read_csv(file_path, chunksize=chunksize, dtype=DTYPES, parse_dates=['timestamp'])
+        return pd.concat([parse_level_columns(chunk) for chunk in chunks], ignore_index=True)
+    # Arrow's parser is multithreaded and faster than the default C engine
+    return parse_level_columns(pd.read_csv(file_path, engine='pyarrow', dtype=DTYPES, parse_dates=['timestamp']))
+
+def load_tsla_data(file_path: str, chunksize: Optional[int] = None) -> pd.DataFrame:
     """
     Load and preprocess TSLA stock data from CSV file
     
     Args:
         file_path (str): Path to the CSV file
+        chunksize (Optional[int]): Parse the file this many rows at a time, so only one
+            chunk's raw Support/Resistance strings are in memory at once
         
     Returns:
         pd.DataFrame: Processed dataframe with OHLCV data and indicators
     """
-    # Read the CSV file
-    df = pd.read_csv(file_path)
-    
-    # Convert timestamp to datetime
-    df['Date'] = pd.to_datetime(df['timestamp'])
+    df = read_tsla_csv(file_path, chunksize)
+    df['Date'] = df['timestamp']
     
     # Convert column names to match our expected format
     df = df.rename(columns={
@@ -28,34 +113,70 @@ def load_tsla_data(file_path: str) -> pd.DataFrame:
         'volume': 'Volume'
     })
     
-    # Process support and resistance columns
-    def process_list_string(x):
-        if pd.isna(x) or x == '[]':
-            return []
-        try:
-            # Handle both string and list formats
-            if isinstance(x, str):
-                # Remove any extra spaces and convert to list
-                x = x.replace(' ', '')
-                return ast.literal_eval(x)
-            return x
-        except:
-            return []
-    
-    df['Support'] = df['Support'].apply(process_list_string)
-    df['Resistance'] = df['Resistance'].apply(process_list_string)
-    
     # Calculate support and resistance bands
-    df['Support_Lower'] = df['Support'].apply(lambda x: min(x) if x else np.nan)
-    df['Support_Upper'] = df['Support'].apply(lambda x: max(x) if x else np.nan)
-    df['Resistance_Lower'] = df['Resistance'].apply(lambda x: min(x) if x else np.nan)
-    df['Resistance_Upper'] = df['Resistance'].apply(lambda x: max(x) if x else np.nan)
+    df = calculate_bands(df)
     
     # Sort by date
     df = df.sort_values('Date')
     
     return df
 
+def level_arrays(column: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Flatten a list-valued level column into values and offsets arrays
+    
+    Args:
+        column (pd.Series): Support or Resistance column of lists, as made by parse_levels
+        
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: float32 levels of all rows in order, and int32
+            offsets where row i's levels are values[offsets[i]:offsets[i + 1]]
+    """
+    lists = column.to_numpy()
+    offsets = np.zeros(len(lists) + 1, dtype=np.int32)
+    np.cumsum(np.fromiter(map(len, lists), dtype=np.int32, count=len(lists)), out=offsets[1:])
+    values = np.fromiter(itertools.chain.from_iterable(lists), dtype=np.float32, count=offsets[-1])
+    return values, offsets
+
+def calculate_bands(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add support and resistance band bounds as float columns
+    
+    Args:
+        df (pd.DataFrame): Dataframe with list-valued Support and Resistance columns
+        
+    Returns:
+        pd.DataFrame: Dataframe with Support/Resistance Lower/Upper columns, NaN where a row has no levels
+    """
+    for column in ('Support', 'Resistance'):
+        # float32 like the prices the bands are drawn against
+        values, offsets = level_arrays(df[column])
+        has_levels = offsets[1:] > offsets[:-1]
+        lower = np.full(len(df), np.nan, dtype=np.float32)
+        upper = lower.copy()
+        if values.size:
+            # Empty rows add no values, so the non-empty rows' starts delimit their segments
+            starts = offsets[:-1][has_levels]
+            lower[has_levels] = np.minimum.reduceat(values, starts)
+            upper[has_levels] = np.maximum.reduceat(values, starts)
+        df[f'{column}_Lower'] = lower
+        df[f'{column}_Upper'] = upper
+    
+    return df
+
+def direction_styles(direction: pd.Series) -> np.ndarray:
+    """
+    Look up the marker style of each row's trading direction
+    
+    Args:
+        direction (pd.Series): direction column, as read with DIRECTION_DTYPE
+        
+    Returns:
+        np.ndarray: MARKER_STYLES index per row, the last one where there's no signal
+    """
+    codes = direction.astype(DIRECTION_DTYPE).cat.codes.to_numpy()
+    return np.where(codes < 0, len(MARKER_STYLES) - 1, codes)
+
 def calculate_direction_markers(df: pd.DataFrame) -> Tuple[List[float], List[str], List[str]]:
     """
     Calculate marker positions and styles based on direction
@@ -66,44 +187,34 @@ def calculate_direction_markers(df: pd.DataFrame) -> Tuple[List[float], List[str
     Returns:
         Tuple[List[float], List[str], List[str]]: Marker positions, colors, and symbols
     """
-    positions = []
-    colors = []
-    symbols = []
-    
-    for idx, row in df.iterrows():
-        if row['direction'] == 'LONG':
-            positions.append(row['Low'] * 0.99)  # Below the candle
-            colors.append('green')
-            symbols.append('triangle-up')
-        elif row['direction'] == 'SHORT':
-            positions.append(row['High'] * 1.01)  # Above the candle
-            colors.append('red')
-            symbols.append('triangle-down')
-        else:
-            positions.append(row['Close'])
-            colors.append('yellow')
-            symbols.append('circle')
+    style = direction_styles(df['direction'])
+    _, symbols, _, colors = (np.array(values) for values in zip(*MARKER_STYLES))
+    
+    positions = np.choose(style, [
+        df['Low'].to_numpy() * 0.99,   # Below the candle
+        df['High'].to_numpy() * 1.01,  # Above the candle
+        df['Close'].to_numpy(),
+    ]).tolist()
+    colors = colors[style].tolist()
+    symbols = symbols[style].tolist()
     
     return positions, colors, symbols
 
-def get_animation_frames(df: pd.DataFrame, frame_duration: int = 100) -> List[dict]:
+def get_animation_frames(df: pd.DataFrame, frame_duration: int = 100) -> Iterator[dict]:
     """
     Generate animation frames for the chart
     
+    Each frame carries only the row it adds; a consumer rebuilds the data
+    shown at frame i by appending the rows of frames 0..i in order.
+    
     Args:
         df (pd.DataFrame): Processed dataframe
         frame_duration (int): Duration of each frame in milliseconds
         
-    Returns:
-        List[dict]: List of frames for animation
+    Yields:
+        dict: The next frame, with the new 'row' and its 'duration'
     """
-    frames = []
-    
-    for i in range(1, len(df) + 1):
-        frame = {
-            'data': df.iloc[:i].to_dict('records'),
-            'duration': frame_duration
-        }
-        frames.append(frame)
-    
-    return frames 
\ No newline at end of file
+    # Rows are converted as they are consumed, so only the current one is held
+    columns = list(df.columns)
+    for values in df.itertuples(index=False, name=None):
+        yield {'row': dict(zip(columns, values)), 'duration': frame_duration}